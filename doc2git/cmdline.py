@@ -1,17 +1,42 @@
+import argparse
+import hashlib
+import json
+import math
 import os
+import posixpath
+import resource
+import stat
 import tempfile
 import shutil
+import signal
+import subprocess
 import sys
+import time
 
 from configparser import ConfigParser
 from subprocess import DEVNULL
 
-from sarge import run as sarge_run, capture_stdout
+from sarge import (run as sarge_run, capture_stdout, shell_format,
+                   shell_quote)
+
+from doc2git.linkcheck import check_links, is_html, INDEX_FILE
 
 
 DOCS = 'docs/source'
 EXCLUDE = ['.buildinfo']
 INI_FILE = 'd2g.ini'
+STAGED_REFS = 'refs/d2g/staged'
+SOURCE_TRAILER = 'D2g-Source'
+CHANGED_PLACEHOLDER = '{changed}'
+MANIFEST_FILE = '.d2g-manifest.json'
+MANIFEST_VERSION = 1
+MANIFEST_FIELDS = ('size', 'sha256', 'mode')
+CHECK_MODES = ('', 'warn', 'fail')
+
+TIMEOUT_EXIT_CODE = 124
+INTERRUPT_EXIT_CODE = 130
+KILL_GRACE_PERIOD = 5
+POLL_INTERVAL = 0.05
 
 HEAD = 95
 BLUE = 94
@@ -105,6 +130,108 @@ def run(command, get_output=False, cwd=None):
         check_exit_code(proc.returncode)
 
 
+def limit_resources(limits):
+    """Return a function to be called in the child process before the command
+    is executed. Limits are a dict with the keys ``memory`` (megabytes of
+    address space) and ``cpu`` (seconds of CPU time).
+    """
+    def preexec():
+        if limits.get('memory'):
+            value = int(limits['memory'] * 1024 * 1024)
+            resource.setrlimit(resource.RLIMIT_AS, (value, value))
+        if limits.get('cpu'):
+            value = int(limits['cpu'])
+            resource.setrlimit(resource.RLIMIT_CPU, (value, value))
+
+    return preexec
+
+
+def kill_process_group(proc):
+    """Send SIGTERM to the process group of the command, wait up to
+    KILL_GRACE_PERIOD seconds for all the processes in the group to exit, and
+    send SIGKILL to the ones still alive.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+    deadline = time.monotonic() + KILL_GRACE_PERIOD
+    while time.monotonic() < deadline:
+        proc.poll()  # Reap the command, the group exists while it's a zombie
+        try:
+            os.killpg(proc.pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(POLL_INTERVAL)
+    else:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    proc.wait()
+
+
+def wait_with_usage(proc, deadline=None):
+    """Wait for the process, return its resource usage. Raise
+    subprocess.TimeoutExpired if the process is still alive at deadline.
+    """
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            if os.WIFSIGNALED(status):
+                proc.returncode = -os.WTERMSIG(status)
+            else:
+                proc.returncode = os.WEXITSTATUS(status)
+            return usage
+        if deadline is not None and time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, 0)
+        time.sleep(POLL_INTERVAL)
+
+
+def run_build(command, cwd, timeout=None, limits=None, env=None):
+    """Run a build command in its own process group, optionally with a timeout
+    (in seconds), resource limits (see limit_resources) and extra environment
+    variables. The whole process group is killed on timeout or Ctrl-C.
+    If command fails, stop program execution.
+    """
+    cprint('===')
+    cprint('===  Command: ', command)
+    cprint('===  CWD:     ', cwd)
+    cprint('===')
+
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+
+    if env is not None:
+        env = dict(os.environ, **env)
+
+    proc = subprocess.Popen(command, shell=True, cwd=cwd, env=env,
+                            start_new_session=True,
+                            preexec_fn=limit_resources(limits or {}))
+    try:
+        usage = wait_with_usage(proc, deadline)
+    except subprocess.TimeoutExpired:
+        kill_process_group(proc)
+        cprint('!!!  Command timed out after {:.1f}s'.format(timeout),
+               color=FAIL)
+        sys.exit(TIMEOUT_EXIT_CODE)
+    except KeyboardInterrupt:
+        kill_process_group(proc)
+        cprint('!!!  Interrupted by user', color=FAIL)
+        sys.exit(INTERRUPT_EXIT_CODE)
+
+    # ru_maxrss is in kilobytes on Linux, in bytes on OS X
+    peak_rss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss /= 1024
+    cprint('===  Time: {:.2f}s, peak RSS: {:.1f} MB'.format(
+           time.monotonic() - start, peak_rss / 1024), color=BLUE)
+
+    check_exit_code(proc.returncode)
+
+
 def get_remote(service, remote_name=''):
     out = run('git remote -v', get_output=True)
 
@@ -120,9 +247,218 @@ def get_remote(service, remote_name=''):
     sys.exit(0)
 
 
-def push_doc(remote, branch, message, output, exclude, extra, tmp):
+def get_source_commit():
+    """Return the commit checked out in the git repository, or None if there
+    are no commits yet or the working tree has changes. The output is built
+    from the working tree, so a commit is only recorded if both are equal.
+    """
+    command = capture_stdout('git rev-parse --verify --quiet HEAD',
+                             cwd=GITPATH)
+    if command.returncode != 0:
+        return None
+    source = command.stdout.read().decode().strip()
+
+    if run('git status --porcelain', get_output=True).strip():
+        cprint('###  Uncommitted changes, the source commit is not recorded'
+               ' and next deploy will consider all files changed',
+               color=WARN)
+        return None
+    return source
+
+
+def get_last_source(deploy, repo_dir):
+    """Return the source commit the deploy commit in repo_dir was built from,
+    read from its trailer. None if unknown or not available locally.
+    """
+    if deploy is None:
+        return None
+
+    message = run('git log -1 --format=%B {}'.format(deploy),
+                  get_output=True, cwd=repo_dir)
+    for line in reversed(message.splitlines()):
+        if line.startswith(SOURCE_TRAILER + ':'):
+            source = line.split(':', 1)[1].strip()
+            # History could be rewritten since the last deploy
+            command = sarge_run('git cat-file -e {}'.format(source),
+                                cwd=GITPATH, stdout=DEVNULL, stderr=DEVNULL)
+            if command.returncode == 0:
+                return source
+            break
+
+    return None
+
+
+def get_changed_files(source):
+    """Return the files changed in the working tree since the source commit,
+    untracked files included. If source is None, return all files.
+    """
+    if source is None:
+        out = run('git ls-files --cached --others --exclude-standard',
+                  get_output=True)
+    else:
+        # Without rename detection, renamed files are listed with both paths
+        out = run('git diff --name-only --no-renames {}'.format(source),
+                  get_output=True)
+        out += run('git ls-files --others --exclude-standard',
+                   get_output=True)
+    return sorted(set(out.splitlines()))
+
+
+def extract_deploy(repo_dir, path):
+    """Copy the files of the deploy cloned in repo_dir to path."""
+    def ignore(folder, names):
+        if folder == repo_dir:
+            return [name for name in names if name in ('.git', MANIFEST_FILE)]
+        return []
+
+    shutil.copytree(repo_dir, path, ignore=ignore, symlinks=True,
+                    dirs_exist_ok=True)
+
+
+def file_hash(path):
+    if os.path.islink(path):
+        return hashlib.sha256(os.readlink(path).encode()).hexdigest()
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_mode(path):
+    """Return the mode as git records it."""
+    mode = os.lstat(path).st_mode
+    if stat.S_ISLNK(mode):
+        return '120000'
+    if mode & stat.S_IXUSR:
+        return '100755'
+    return '100644'
+
+
+def build_manifest(path):
+    """Return a dict with the size, sha256 and mode of every file in path,
+    keyed by its relative path. The .git folder and the manifest itself are
+    ignored.
+    """
+    files = {}
+    for root, dirs, filenames in os.walk(path):
+        if root == path and '.git' in dirs:
+            dirs.remove('.git')
+        # Symbolic links to folders are not followed, git stores them as
+        # links
+        links = [name for name in dirs
+                 if os.path.islink(os.path.join(root, name))]
+        for filename in filenames + links:
+            full_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(full_path, path)
+            if rel_path == MANIFEST_FILE:
+                continue
+            files[rel_path] = {'size': os.lstat(full_path).st_size,
+                               'sha256': file_hash(full_path),
+                               'mode': file_mode(full_path)}
+    return files
+
+
+def write_manifest(path, files):
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f,
+                  indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def read_manifest(commit, cwd=None):
+    """Return the files in the manifest of a deploy commit. Empty if the
+    commit has no manifest.
+    """
+    command = capture_stdout('git show {}:{}'.format(commit, MANIFEST_FILE),
+                             cwd=cwd or GITPATH, stderr=DEVNULL)
+    if command.returncode != 0:
+        return {}
+    try:
+        manifest = json.loads(command.stdout.read().decode())
+    except ValueError:
+        cprint('###  Invalid manifest in ', commit, color=WARN)
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest['files']
+
+
+def diff_manifests(old, new):
+    """Return the added, changed and removed paths, sorted."""
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(path for path in set(old) & set(new)
+                     if any(old[path][field] != new[path][field]
+                            for field in MANIFEST_FIELDS))
+    return added, changed, removed
+
+
+def report_changes(old, new):
+    added, changed, removed = diff_manifests(old, new)
+    new_bytes = sum(new[path]['size'] for path in added + changed)
+    removed_bytes = sum(old[path]['size'] for path in removed)
+    cprint('===  Changes: {} added, {} changed, {} removed ({} bytes to'
+           ' upload, {} bytes removed)'.format(len(added), len(changed),
+                                               len(removed), new_bytes,
+                                               removed_bytes), color=BLUE)
+
+
+def check_output(path, old_manifest, manifest, mode, workers=None):
+    """Check the links of the pages added or changed since the previous
+    deploy, of the pages linking to an added, changed or removed file, and of
+    the pages with broken links in the previous deploy. The links of every
+    page, and whether they are broken, are recorded in the manifest to find
+    them in the next deploy. If the previous manifest has no links all pages
+    are checked.
+    If mode is 'fail', stop program execution when a broken link is found.
+    """
+    added, changed, removed = diff_manifests(old_manifest, manifest)
+    old_pages = [page for page in old_manifest
+                 if is_html(page) and page in manifest]
+
+    if all('links' in old_manifest[page] for page in old_pages):
+        modified = set(added + changed + removed)
+        # Links to a missing folder are recorded as the folder
+        modified.update(posixpath.dirname(path) for path in added
+                        if posixpath.basename(path) == INDEX_FILE)
+        pages = set(added + changed)
+        pages.update(page for page in old_pages
+                     if old_manifest[page].get('broken') or
+                     modified.intersection(old_manifest[page]['links']))
+    else:
+        pages = None
+
+    cprint('===  Checking links')
+    problems, links = check_links(path, manifest, pages, workers)
+
+    for page in manifest:
+        if page in links:
+            manifest[page]['links'] = links[page]
+        elif page in old_manifest and 'links' in old_manifest[page]:
+            manifest[page]['links'] = old_manifest[page]['links']
+
+    for page in {page for page, _, _, _ in problems}:
+        manifest[page]['broken'] = True
+
+    for page, line, url, reason in problems:
+        cprint('###  {}:{}: {} ({})'.format(page, line, url, reason),
+               color=WARN)
+
+    if not problems:
+        cprint('===  No broken links found', color=OK)
+    elif mode == 'fail':
+        cprint('!!!  {} broken links found'.format(len(problems)), color=FAIL)
+        sys.exit(1)
+
+
+def clone_deploy(remote, branch, tmp):
+    """Clone the remote repository to tmp with branch checked out, the branch
+    is created if it doesn't exist. Return the commit at the tip of the
+    branch, None for a new branch.
+    """
     repo_dir = os.path.join(tmp, 'repo')
-    docs_dir = os.path.join(tmp, 'copy', output)
 
     # Try to clone the repo branch
     command = sarge_run('git clone {0} -b {1} repo'.format(remote, branch),
@@ -142,6 +478,21 @@ def push_doc(remote, branch, message, output, exclude, extra, tmp):
     if command.returncode != 0:  # branch doesn't exists
         cprint('===  Creating new branch "{}"'.format(branch))
         run('git checkout --orphan {}'.format(branch), cwd=repo_dir)
+        return None
+
+    return run('git rev-parse HEAD', get_output=True, cwd=repo_dir).strip()
+
+
+def push_doc(remote, branch, message, output, exclude, extra, tmp,
+             source=None, check='', check_workers=None):
+    repo_dir = os.path.join(tmp, 'repo')
+    docs_dir = os.path.join(tmp, 'copy', output)
+
+    # main clones the deploy branch before generating the output
+    if not os.path.exists(repo_dir):
+        clone_deploy(remote, branch, tmp)
+
+    old_manifest = read_manifest('HEAD', cwd=repo_dir)
 
     run('git rm -rf .', cwd=repo_dir)
     for entry in extra:
@@ -149,38 +500,219 @@ def push_doc(remote, branch, message, output, exclude, extra, tmp):
 
     for entry in os.listdir(docs_dir):
         if entry not in exclude:
-            shutil.move(os.path.join(docs_dir, entry), repo_dir)
+            shutil.move(os.path.join(docs_dir, entry),
+                        os.path.join(repo_dir, entry))
+
+    manifest = build_manifest(repo_dir)
+    report_changes(old_manifest, manifest)
+
+    if check:
+        check_output(repo_dir, old_manifest, manifest, check, check_workers)
+    write_manifest(repo_dir, manifest)
 
     run('git add -A', cwd=repo_dir)
-    run('git commit -m "{}"'.format(message), cwd=repo_dir)
-    run('git push origin {}'.format(branch), cwd=repo_dir)
+    if source is None:
+        run('git commit -m "{}"'.format(message), cwd=repo_dir)
+    else:
+        run('git commit -m "{}" -m "{}: {}"'.format(
+            message, SOURCE_TRAILER, source), cwd=repo_dir)
+
+    command = sarge_run('git push origin {}'.format(branch), cwd=repo_dir)
+    if command.returncode != 0:
+        stage_doc(branch, repo_dir)
+        cprint('!!!  Push failed, run "d2g --resume" to try again without'
+               ' generating the documentation', color=FAIL)
+        sys.exit(command.returncode)
 
     cprint('===')
     cprint('===  Documentation pushed.')
     cprint('===')
 
 
-def generate_output(commands, tmp, ignore_patterns):
+def staged_refs(branch):
+    """Return the staged deploys for branch as (timestamp, ref) tuples, oldest
+    first.
+    """
+    prefix = '{}/{}/'.format(STAGED_REFS, branch)
+    out = run('git for-each-ref --format="%(refname)" {}'.format(prefix),
+              get_output=True)
+
+    refs = []
+    for ref in out.split():
+        stamp = ref[len(prefix):]
+        if stamp.isdigit():
+            refs.append((int(stamp), ref))
+    return sorted(refs)
+
+
+def stage_doc(branch, repo_dir):
+    """Save the deploy commit in repo_dir to the local git repository, so it
+    can be pushed later with resume_doc.
+    """
+    ref = '{}/{}/{}'.format(STAGED_REFS, branch, int(time.time()))
+    run('git push {} HEAD:{}'.format(GITPATH, ref), cwd=repo_dir)
+    cprint('===  Deploy saved as ', ref, color=WARN)
+
+
+def resume_doc(remote, branch):
+    """Push the last staged deploy for branch. If the remote branch has moved
+    since, the commit is re-parented on top of it.
+    """
+    refs = staged_refs(branch)
+    if not refs:
+        cprint('!!!  No staged deploy found for branch "{}"'.format(branch),
+               color=FAIL)
+        sys.exit(0)
+
+    ref = refs[-1][1]
+
+    # Work in a clone, the fetches don't touch the git repository
+    with tempfile.TemporaryDirectory(prefix='d2g_') as tmp:
+        repo_dir = os.path.join(tmp, 'repo')
+        tip = clone_deploy(remote, branch, tmp)
+
+        run('git fetch {} {}'.format(GITPATH, ref), cwd=repo_dir)
+        commit = run('git rev-parse FETCH_HEAD', get_output=True,
+                     cwd=repo_dir).strip()
+
+        if tip is not None:
+            parents = run('git log -1 --format=%P {}'.format(commit),
+                          get_output=True, cwd=repo_dir).split()
+            if parents != [tip]:
+                cprint('===  Remote branch moved, re-parenting deploy commit')
+                message = run('git log -1 --format=%B {}'.format(commit),
+                              get_output=True, cwd=repo_dir).strip()
+                tree = run('git log -1 --format=%T {}'.format(commit),
+                           get_output=True, cwd=repo_dir).strip()
+                commit = run(shell_format('git commit-tree {0} -p {1} -m {2}',
+                                          tree, tip, message),
+                             get_output=True, cwd=repo_dir).strip()
+
+        run('git push origin {}:refs/heads/{}'.format(commit, branch),
+            cwd=repo_dir)
+
+    for _, old_ref in refs:
+        run('git update-ref -d {}'.format(old_ref))
+
+    cprint('===')
+    cprint('===  Documentation pushed.')
+    cprint('===')
+
+
+def remove_old_staged(max_age):
+    """Delete staged deploys older than max_age days."""
+    if max_age is None:
+        return
+
+    out = run('git for-each-ref --format="%(refname)" {}'
+              .format(STAGED_REFS), get_output=True)
+    limit = time.time() - max_age * 24 * 60 * 60
+    for ref in out.split():
+        stamp = ref.rsplit('/', 1)[-1]
+        if stamp.isdigit() and int(stamp) < limit:
+            run('git update-ref -d {}'.format(ref))
+
+
+def generate_output(commands, tmp, ignore_patterns, timeout=None,
+                    total_timeout=None, limits=None, changed=None,
+                    last_source=None, output=None, previous=None):
+    """Copy the git repository to tmp and run the build commands there.
+    timeout applies to every command, total_timeout to all of them together.
+
+    If changed, the list of files changed since last_source, is given, it is
+    available to the commands in the D2G_CHANGED_FILES file (one path per
+    line) and, if last_source is known, in the {changed} placeholder.
+
+    If previous, the path to the clone of the previous deploy, is given, its
+    files are copied to the output folder before running the commands.
+    """
     temp_dir = os.path.join(tmp, 'copy')
     ignore = ['.git']
     ignore.extend(ignore_patterns)
     shutil.copytree(GITPATH, temp_dir, ignore=shutil.ignore_patterns(*ignore),
                     symlinks=True)
 
+    if previous is not None:
+        extract_deploy(previous, os.path.join(temp_dir, output))
+
     if '\n' in commands:
         commands = value_as_list(commands)
     else:
         commands = [commands]
 
+    env = None
+    if changed is not None:
+        changed_path = os.path.join(tmp, 'changed_files')
+        with open(changed_path, 'w') as changed_file:
+            changed_file.writelines(path + '\n' for path in changed)
+        env = {'D2G_CHANGED_FILES': changed_path,
+               'D2G_LAST_SOURCE': last_source or ''}
+        # With an unknown source all files are changed, the list could be too
+        # long for a command line
+        quoted = ''
+        if last_source is not None:
+            quoted = ' '.join(shell_quote(path) for path in changed)
+        commands = [command.replace(CHANGED_PLACEHOLDER, quoted)
+                    for command in commands]
+
+    deadline = None
+    if total_timeout is not None:
+        deadline = time.monotonic() + total_timeout
+
     for command in commands:
-        run(command, cwd=temp_dir)
+        command_timeout = timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                cprint('!!!  Total timeout exceeded', color=FAIL)
+                sys.exit(TIMEOUT_EXIT_CODE)
+            if command_timeout is None or remaining < command_timeout:
+                command_timeout = remaining
+        run_build(command, cwd=temp_dir, timeout=command_timeout,
+                  limits=limits, env=env)
 
 
 def value_as_list(values):
     return [x for x in list(map(str.strip, values.strip().split('\n'))) if x]
 
 
-def main():
+def value_as_number(value):
+    """Empty values are None, meaning no limit."""
+    value = value.strip()
+    if not value:
+        return None
+    return float(value)
+
+
+def number_option(conf, section, key, integer=False):
+    """Return the option as a number, None if empty. If it isn't a positive
+    number, or an integer if required, stop program execution.
+    """
+    try:
+        value = value_as_number(conf[section][key])
+    except ValueError:
+        value = math.nan
+
+    if value is None:
+        return None
+    if not (math.isfinite(value) and value > 0) or \
+            (integer and value != int(value)):
+        cprint('!!!  Invalid {} value "{}", use a positive {} or leave it'
+               ' empty'.format(key, conf[section][key].strip(),
+                               'integer' if integer else 'number'),
+               color=FAIL)
+        sys.exit(1)
+    return int(value) if integer else value
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        prog='d2g', description='Generate content and push it to git')
+    parser.add_argument('--resume', action='store_true',
+                        help='push the last deploy that could not be pushed,'
+                             ' without generating the content again')
+    args = parser.parse_args(argv)
 
     global GITPATH
     GITPATH = get_git_path()
@@ -190,8 +722,52 @@ def main():
     ignore_patterns = value_as_list(conf['doc']['ignore_patterns'])
     remote = get_remote(conf['git']['service'], conf['git']['remote'])
 
+    staged_max_age = number_option(conf, 'git', 'staged_max_age')
+    timeout = number_option(conf, 'doc', 'timeout')
+    total_timeout = number_option(conf, 'doc', 'total_timeout')
+    limits = {'memory': number_option(conf, 'doc', 'memory_limit'),
+              'cpu': number_option(conf, 'doc', 'cpu_limit')}
+
+    remove_old_staged(staged_max_age)
+
+    if args.resume:
+        resume_doc(remote, conf['git']['branch'])
+        return
+
+    check = conf['doc']['check_links'].strip()
+    if check not in CHECK_MODES:
+        cprint('!!!  Invalid check_links value "{}", use "warn", "fail" or'
+               ' leave it empty'.format(check), color=FAIL)
+        sys.exit(1)
+    check_workers = number_option(conf, 'doc', 'check_workers', integer=True)
+
+    source = get_source_commit()
+
     with tempfile.TemporaryDirectory(prefix='d2g_') as tmp:
-        generate_output(conf['doc']['command'], tmp, ignore_patterns)
+        # The clone is reused by push_doc
+        repo_dir = os.path.join(tmp, 'repo')
+        deploy = clone_deploy(remote, conf['git']['branch'], tmp)
+
+        last_source = get_last_source(deploy, repo_dir)
+        changed = get_changed_files(last_source)
+        if last_source is None:
+            cprint('===  Previous source commit unknown, all files changed')
+        else:
+            cprint('===  {} files changed since {}'.format(
+                len(changed), last_source))
+
+        # Incremental builds start from the previous output, unless
+        # everything has to be built again
+        previous = None
+        if conf['doc'].getboolean('incremental') and last_source is not None:
+            previous = repo_dir
+
+        generate_output(conf['doc']['command'], tmp, ignore_patterns,
+                        timeout=timeout, total_timeout=total_timeout,
+                        limits=limits, changed=changed,
+                        last_source=last_source,
+                        output=conf['doc']['output_folder'],
+                        previous=previous)
 
         # Values to list
         exclude = value_as_list(conf['doc']['exclude'])
@@ -201,4 +777,6 @@ def main():
                  message=conf['git']['message'],
                  output=conf['doc']['output_folder'],
                  exclude=exclude, extra=extra,
-                 tmp=tmp)
+                 tmp=tmp, source=source,
+                 check=check,
+                 check_workers=check_workers)
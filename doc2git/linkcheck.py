@@ -0,0 +1,183 @@
+"""Check internal links, anchors and assets of the generated HTML pages.
+
+Pages are parsed on a pool of processes, links are resolved against the list
+of output files, so no file is read twice and nothing is requested over the
+network. External links and links relative to the site root (starting with
+``/``) are not checked, the site root is unknown.
+"""
+import os
+import posixpath
+
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, unquote
+
+
+HTML_EXTENSIONS = ('.html', '.htm')
+INDEX_FILE = 'index.html'
+MAX_LINK_DEPTH = 8
+
+# Attribute with the link for every tag to check
+LINK_ATTRS = {'a': 'href',
+              'area': 'href',
+              'link': 'href',
+              'img': 'src',
+              'script': 'src',
+              'iframe': 'src',
+              'embed': 'src',
+              'source': 'src',
+              'audio': 'src',
+              'video': 'src'}
+
+FILE_NOT_FOUND = 'file not found'
+ANCHOR_NOT_FOUND = 'anchor not found'
+
+
+class PageParser(HTMLParser):
+    """Collect the links and the anchors of a HTML page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.ids = set()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if attrs.get('id'):
+            self.ids.add(attrs['id'])
+        if tag == 'a' and attrs.get('name'):
+            self.ids.add(attrs['name'])
+
+        attr = LINK_ATTRS.get(tag)
+        if attr and attrs.get(attr):
+            self.links.append((self.getpos()[0], attrs[attr].strip()))
+
+
+def parse_page(path):
+    """Return the links, as (line, url) tuples, and the anchors of a page."""
+    parser = PageParser()
+    with open(path, encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+    parser.close()
+    return parser.links, parser.ids
+
+
+def parse_pages(executor, root, pages):
+    """Parse the pages in parallel, return a dict page: (links, anchors)."""
+    paths = [os.path.join(root, page) for page in pages]
+    return dict(zip(pages, executor.map(parse_page, paths, chunksize=16)))
+
+
+def is_html(path):
+    return path.lower().endswith(HTML_EXTENSIONS)
+
+
+def find_folder_links(root, files):
+    """Return the symbolic links to folders in files, with the path they point
+    to, relative to root.
+    """
+    folder_links = {}
+    for path in files:
+        full_path = os.path.join(root, path)
+        if os.path.islink(full_path) and os.path.isdir(full_path):
+            folder_links[path] = posixpath.normpath(posixpath.join(
+                posixpath.dirname(path), os.readlink(full_path)))
+    return folder_links
+
+
+def follow_links(target, folder_links):
+    """Replace the symbolic links to folders in target with the path they
+    point to.
+    """
+    for _ in range(MAX_LINK_DEPTH):
+        parts = target.split('/')
+        for i in range(1, len(parts) + 1):
+            prefix = '/'.join(parts[:i])
+            if prefix in folder_links:
+                target = posixpath.normpath(
+                    posixpath.join(folder_links[prefix], *parts[i:]))
+                break
+        else:
+            break
+    return target
+
+
+def is_outside(path):
+    return path == '..' or path.startswith(('../', '/'))
+
+
+def resolve(page, url, files, folder_links=None):
+    """Return the output file and the anchor an url in page points to. The
+    file is None for urls that are not checked, it isn't in files if it
+    doesn't exist. Symbolic links to folders are followed, links through
+    them to files outside the output are not checked.
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or url.startswith('/'):
+        return None, None
+
+    fragment = unquote(parts.fragment)
+    path = unquote(parts.path)
+    if not path:
+        return page, fragment
+
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(page), path))
+    if folder_links and not is_outside(target):
+        target = follow_links(target, folder_links)
+        if is_outside(target):
+            return None, None
+
+    candidates = [target, posixpath.join(target, INDEX_FILE)]
+    if target == '.':
+        candidates = [INDEX_FILE]
+    for candidate in candidates:
+        if candidate in files:
+            return candidate, fragment
+    return candidates[0], fragment
+
+
+def check_links(root, files, pages=None, workers=None):
+    """Check the links in the HTML pages found in root. files are the paths,
+    relative to root, of all output files. Only pages are checked if given,
+    otherwise every HTML file. workers is the number of processes, by default
+    one per CPU.
+
+    Return a list of (page, line, url, reason) tuples, one per broken link,
+    and a dict with the sorted list of files, missing ones included, every
+    checked page links to.
+    """
+    files = set(files)
+    if pages is None:
+        pages = files
+    pages = sorted(page for page in pages if page in files and is_html(page))
+    if not pages:
+        return [], {}
+    folder_links = find_folder_links(root, files)
+
+    with ProcessPoolExecutor(workers) as executor:
+        parsed = parse_pages(executor, root, pages)
+
+        links = []
+        for page in pages:
+            for line, url in parsed[page][0]:
+                target, fragment = resolve(page, url, files, folder_links)
+                if target is not None:
+                    links.append((page, line, url, target, fragment))
+
+        # Anchors of the pages linked from the checked pages
+        targets = sorted({target for _, _, _, target, fragment in links
+                          if fragment and target in files and
+                          is_html(target) and target not in parsed})
+        parsed.update(parse_pages(executor, root, targets))
+
+    linked = {page: set() for page in pages}
+    problems = []
+    for page, line, url, target, fragment in links:
+        linked[page].add(target)
+        if target not in files:
+            problems.append((page, line, url, FILE_NOT_FOUND))
+        elif fragment and is_html(target) and \
+                fragment not in parsed[target][1]:
+            problems.append((page, line, url, ANCHOR_NOT_FOUND))
+    return problems, {page: sorted(linked[page]) for page in pages}
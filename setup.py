@@ -22,7 +22,7 @@ setup(name='doc2git',
         'Topic :: Utilities',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
-        'Operating System :: OS Independent',
+        'Operating System :: POSIX',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3.3',
         ],
@@ -2,6 +2,7 @@ import tempfile
 import os
 import shutil
 import sys
+import time
 from io import StringIO
 from unittest import TestCase
 from subprocess import DEVNULL
@@ -10,9 +11,12 @@ from configparser import ConfigParser
 
 import sarge
 
-from doc2git import cmdline
+from doc2git import cmdline, linkcheck
 from doc2git.cmdline import (get_git_path, get_conf, run, get_remote, main,
-                             generate_output, push_doc)
+                             generate_output, push_doc, run_build,
+                             resume_doc, staged_refs, remove_old_staged,
+                             build_manifest, diff_manifests, read_manifest,
+                             number_option)
 
 
 class TestCaseWithTmp(TestCase):
@@ -90,6 +94,66 @@ class TestRun(TestCaseWithTmp):
         self.assertRaises(SystemExit, run, 'false')
 
 
+class TestRunBuild(TestCaseWithTmp):
+
+    def test_run_build(self):
+        run_build('touch built', cwd=self.tempd)
+        self.assertTrue(os.path.exists('built'))
+
+    def test_invalid_command(self):
+        self.assertRaises(SystemExit, run_build, 'false', self.tempd)
+
+    def test_timeout(self):
+        start = time.monotonic()
+        with self.assertRaises(SystemExit) as cm:
+            run_build('sleep 10', cwd=self.tempd, timeout=0.2)
+        self.assertEqual(cm.exception.code, cmdline.TIMEOUT_EXIT_CODE)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_timeout_kills_children(self):
+        with self.assertRaises(SystemExit):
+            run_build('(sleep 0.5 && touch late) & sleep 10', cwd=self.tempd,
+                      timeout=0.2)
+        time.sleep(1)
+        self.assertFalse(os.path.exists('late'))
+
+    def test_timeout_grace_period(self):
+        # Children ignoring SIGTERM are killed after the grace period
+        command = "trap '' TERM; (trap '' TERM; sleep 10) & sleep 10"
+        start = time.monotonic()
+        with mock.patch('doc2git.cmdline.KILL_GRACE_PERIOD', 0.5):
+            self.assertRaises(SystemExit, run_build, command, self.tempd,
+                              timeout=0.2)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_memory_limit(self):
+        command = '{} -c "bytearray(512 * 1024 * 1024)"'.format(sys.executable)
+        self.assertRaises(SystemExit, run_build, command, self.tempd,
+                          limits={'memory': 256})
+
+
+class TestNumberOption(TestCase):
+
+    def test_number_option(self):
+        conf = ConfigParser()
+        conf['doc'] = {'empty': '', 'int': '3', 'float': '0.5'}
+        self.assertIsNone(number_option(conf, 'doc', 'empty'))
+        self.assertEqual(number_option(conf, 'doc', 'int'), 3)
+        self.assertEqual(number_option(conf, 'doc', 'float'), 0.5)
+        self.assertEqual(number_option(conf, 'doc', 'int', integer=True), 3)
+
+    def test_invalid_number_option(self):
+        conf = ConfigParser()
+        conf['doc'] = {'text': 'abc', 'negative': '-1', 'zero': '0',
+                       'infinite': 'inf'}
+        for key in conf['doc']:
+            self.assertRaises(SystemExit, number_option, conf, 'doc', key)
+
+        conf['doc']['float'] = '0.5'
+        self.assertRaises(SystemExit, number_option, conf, 'doc', 'float',
+                          integer=True)
+
+
 class TestGetGitRemote(TestCaseWithTmp):
 
     @classmethod
@@ -132,6 +196,44 @@ class TestGenerateOutput(TestCaseWithTmp):
             self.assertTrue(os.path.exists(os.path.join(tmp_test, 'test_dir')))
             self.assertFalse(os.path.exists(os.path.join(tmp_test, '.git')))
 
+    def test_generate_output_changed_files(self):
+        os.makedirs('.git')
+
+        with tempfile.TemporaryDirectory(prefix='test') as tmp_test, \
+                tempfile.TemporaryDirectory(prefix='d2g_') as tmp:
+
+            commands = ('cp $D2G_CHANGED_FILES {0}/changed\n'
+                        'echo $D2G_LAST_SOURCE {{changed}} > {0}/args'
+                        .format(tmp_test))
+            generate_output(commands, tmp, [], changed=['a b', 'c'],
+                            last_source='1234')
+
+            with open(os.path.join(tmp_test, 'changed')) as changed:
+                self.assertEqual(changed.read(), 'a b\nc\n')
+            with open(os.path.join(tmp_test, 'args')) as args:
+                self.assertEqual(args.read(), '1234 a b c\n')
+
+    def test_total_timeout(self):
+        os.makedirs('.git')
+
+        with tempfile.TemporaryDirectory(prefix='d2g_') as tmp:
+            with self.assertRaises(SystemExit) as cm:
+                generate_output('sleep 0.2\nsleep 10', tmp, [],
+                                total_timeout=0.5)
+            self.assertEqual(cm.exception.code, cmdline.TIMEOUT_EXIT_CODE)
+
+    def test_total_timeout_exceeded(self):
+        os.makedirs('.git')
+
+        with tempfile.TemporaryDirectory(prefix='test') as tmp_test, \
+                tempfile.TemporaryDirectory(prefix='d2g_') as tmp:
+            commands = 'touch {}/not_run'.format(tmp_test)
+            with self.assertRaises(SystemExit) as cm:
+                generate_output(commands, tmp, [], total_timeout=0)
+            self.assertEqual(cm.exception.code, cmdline.TIMEOUT_EXIT_CODE)
+            self.assertFalse(os.path.exists(os.path.join(tmp_test,
+                                                         'not_run')))
+
 
 class TestMain(TestCaseWithTmp):
 
@@ -178,7 +280,7 @@ class TestMain(TestCaseWithTmp):
             config.write(configfile)
 
         os.chdir(repo_dir)
-        main()
+        main([])
 
         files = sarge.get_stdout('git ls-tree --name-only -r {}'
                                  .format(config['git']['branch']),
@@ -187,6 +289,141 @@ class TestMain(TestCaseWithTmp):
         self.assertTrue('bar.html' in files.split())
         self.assertTrue('foo.html' not in files.split())
 
+    def make_repos(self, doc, files=('readme',)):
+        """Create a git repository with a d2g.ini file and a bare repository
+        used as its remote. Return the bare repository path.
+        """
+        repo_dir = os.path.join(self.tempd, 'normal_repo')
+        bare_dir = os.path.join(self.tempd, 'bare_repo')
+        os.makedirs(repo_dir)
+        os.makedirs(bare_dir)
+
+        config = ConfigParser()
+        config['doc'] = doc
+        config['git'] = {'service': 'bare_repo', 'branch': 'some_branch'}
+        with open(os.path.join(repo_dir, 'd2g.ini'), 'w') as configfile:
+            config.write(configfile)
+
+        for filename in files:
+            sarge.run('touch {}'.format(filename), cwd=repo_dir,
+                      stdout=DEVNULL)
+        sarge.run('git init', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git add .', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git commit -m "Test"', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git --bare init', cwd=bare_dir,
+                  stdout=DEVNULL, stderr=DEVNULL)
+        sarge.run('git remote add origin {}'.format(bare_dir), cwd=repo_dir,
+                  stdout=DEVNULL, stderr=DEVNULL)
+        sarge.run('git push origin master', cwd=repo_dir,
+                  stdout=DEVNULL, stderr=DEVNULL)
+
+        os.chdir(repo_dir)
+        return bare_dir
+
+    @mock.patch('doc2git.cmdline.sarge_run')
+    def test_main_changed_files(self, m):
+        m.side_effect = lambda *args, **kw: sarge.run(*args,
+                                                      **dict(kw,
+                                                             stdout=DEVNULL,
+                                                             stderr=DEVNULL))
+        bare_dir = self.make_repos({
+            'command': 'mkdir output\n'
+                       'cp $D2G_CHANGED_FILES output/changed\n'
+                       'echo {changed} > output/args',
+            'output_folder': 'output'})
+
+        def show(path):
+            return sarge.get_stdout('git show some_branch:{}'.format(path),
+                                    cwd=bare_dir)
+
+        def message():
+            return sarge.get_stdout('git log -1 --format=%B some_branch',
+                                    cwd=bare_dir)
+
+        # First deploy, all files are changed, but not in {changed}
+        main([])
+        self.assertEqual(show('changed').split(), ['d2g.ini', 'readme'])
+        self.assertEqual(show('args').split(), [])
+
+        source = sarge.get_stdout('git rev-parse HEAD').strip()
+        self.assertTrue('D2g-Source: {}'.format(source) in message())
+
+        # Second deploy, only new files are changed. The working tree is
+        # dirty, so the source is not recorded
+        sarge.run('touch new_file', stdout=DEVNULL)
+        main([])
+        self.assertEqual(show('changed').split(), ['new_file'])
+        self.assertEqual(show('args').split(), ['new_file'])
+        self.assertFalse('D2g-Source' in message())
+
+        # Third deploy, source of the previous deploy is unknown
+        main([])
+        self.assertEqual(show('changed').split(),
+                         ['d2g.ini', 'new_file', 'readme'])
+
+        # Nothing is fetched into the git repository
+        self.assertFalse(os.path.exists(os.path.join('.git', 'FETCH_HEAD')))
+
+    @mock.patch('doc2git.cmdline.sarge_run')
+    def test_main_incremental(self, m):
+        m.side_effect = lambda *args, **kw: sarge.run(*args,
+                                                      **dict(kw,
+                                                             stdout=DEVNULL,
+                                                             stderr=DEVNULL))
+        bare_dir = self.make_repos({
+            'command': 'mkdir -p output\n'
+                       'for f in $(cat $D2G_CHANGED_FILES); do'
+                       ' if [ -e $f ]; then cp $f output/$f.html;'
+                       ' else rm -f output/$f.html; fi; done',
+            'output_folder': 'output',
+            'incremental': 'yes'}, files=('a', 'b'))
+
+        main([])
+
+        with open('a', 'w') as f:
+            f.write('changed')
+        sarge.run('git commit -am "Change a"', stdout=DEVNULL)
+        main([])
+
+        files = sarge.get_stdout('git ls-tree --name-only -r some_branch',
+                                 cwd=bare_dir).split()
+        self.assertEqual(files, [cmdline.MANIFEST_FILE, '.nojekyll', 'a.html',
+                                 'b.html', 'd2g.ini.html'])
+
+        # Renamed files are reported with the old and the new path
+        sarge.run('git mv b c', stdout=DEVNULL)
+        sarge.run('git commit -m "Rename b"', stdout=DEVNULL)
+        main([])
+
+        files = sarge.get_stdout('git ls-tree --name-only -r some_branch',
+                                 cwd=bare_dir).split()
+        self.assertEqual(files, [cmdline.MANIFEST_FILE, '.nojekyll', 'a.html',
+                                 'c.html', 'd2g.ini.html'])
+
+    def test_main_invalid_number(self):
+        self.make_repos({'command': 'mkdir output',
+                         'output_folder': 'output',
+                         'timeout': 'abc'})
+        with mock.patch('doc2git.cmdline.generate_output') as generate:
+            self.assertRaises(SystemExit, main, [])
+        self.assertFalse(generate.called)
+
+    def test_main_invalid_check_workers(self):
+        self.make_repos({'command': 'mkdir output',
+                         'output_folder': 'output',
+                         'check_workers': '0'})
+        with mock.patch('doc2git.cmdline.generate_output') as generate:
+            self.assertRaises(SystemExit, main, [])
+        self.assertFalse(generate.called)
+
+    def test_main_invalid_check_links(self):
+        self.make_repos({'command': 'mkdir output',
+                         'output_folder': 'output',
+                         'check_links': 'yes'})
+        with mock.patch('doc2git.cmdline.generate_output') as generate:
+            self.assertRaises(SystemExit, main, [])
+        self.assertFalse(generate.called)
+
 
 class TestPushDoc(TestCaseWithTmp):
     @mock.patch('doc2git.cmdline.sarge_run')
@@ -241,3 +478,286 @@ class TestPushDoc(TestCaseWithTmp):
                                      cwd=bare_dir)
             self.assertTrue('output_2.txt' in files.split())
             self.assertFalse('output.txt' in files.split())
+
+
+class TestResume(TestCaseWithTmp):
+
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = os.path.join(self.tempd, 'normal_repo')
+        self.bare_dir = os.path.join(self.tempd, 'bare_repo')
+        os.makedirs(self.repo_dir)
+        cmdline.GITPATH = self.repo_dir
+
+        sarge.run('touch readme', cwd=self.repo_dir, stdout=DEVNULL)
+        sarge.run('git init', cwd=self.repo_dir, stdout=DEVNULL)
+        sarge.run('git add .', cwd=self.repo_dir, stdout=DEVNULL)
+        sarge.run('git commit -m "Test"', cwd=self.repo_dir, stdout=DEVNULL)
+
+        sarge.run('git clone --bare {} bare_repo'.format(self.repo_dir),
+                  cwd=self.tempd, stdout=DEVNULL, stderr=DEVNULL)
+
+        self.hook = os.path.join(self.bare_dir, 'hooks', 'pre-receive')
+
+    def reject_pushes(self, reject=True):
+        if reject:
+            with open(self.hook, 'w') as hook:
+                hook.write('#!/bin/sh\nexit 1\n')
+            os.chmod(self.hook, 0o755)
+        else:
+            os.remove(self.hook)
+
+    def push(self, filename):
+        with tempfile.TemporaryDirectory(prefix='test') as tmp:
+            output_dir = os.path.join(tmp, 'copy', 'output')
+            os.makedirs(output_dir)
+            sarge.run('touch {}'.format(filename), cwd=output_dir,
+                      stdout=DEVNULL)
+            push_doc(self.bare_dir, 'dev', 'Commit msg', 'output', [], '',
+                     tmp)
+
+    def files(self):
+        return sarge.get_stdout('git ls-tree --name-only -r dev',
+                                cwd=self.bare_dir).split()
+
+    @mock.patch('doc2git.cmdline.sarge_run')
+    def test_failed_push_is_staged(self, m):
+        m.side_effect = lambda *args, **kw: sarge.run(*args,
+                                                      **dict(kw,
+                                                             stdout=DEVNULL,
+                                                             stderr=DEVNULL))
+        self.reject_pushes()
+        self.assertRaises(SystemExit, self.push, 'output.txt')
+        self.assertEqual(len(staged_refs('dev')), 1)
+
+        self.reject_pushes(False)
+        resume_doc(self.bare_dir, 'dev')
+
+        self.assertTrue('output.txt' in self.files())
+        self.assertEqual(staged_refs('dev'), [])
+
+    @mock.patch('doc2git.cmdline.sarge_run')
+    def test_resume_reparents(self, m):
+        m.side_effect = lambda *args, **kw: sarge.run(*args,
+                                                      **dict(kw,
+                                                             stdout=DEVNULL,
+                                                             stderr=DEVNULL))
+        self.reject_pushes()
+        self.assertRaises(SystemExit, self.push, 'staged.txt')
+
+        # Remote moves before the deploy is resumed
+        self.reject_pushes(False)
+        self.push('other.txt')
+        tip = sarge.get_stdout('git rev-parse dev', cwd=self.bare_dir).strip()
+
+        resume_doc(self.bare_dir, 'dev')
+
+        self.assertEqual(self.files(), [cmdline.MANIFEST_FILE, 'staged.txt'])
+        parent = sarge.get_stdout('git log -1 --format=%P dev',
+                                  cwd=self.bare_dir).strip()
+        self.assertEqual(parent, tip)
+        self.assertFalse(os.path.exists(os.path.join(self.repo_dir, '.git',
+                                                     'FETCH_HEAD')))
+
+    def test_resume_nothing_staged(self):
+        self.assertRaises(SystemExit, resume_doc, self.bare_dir, 'dev')
+
+    def test_remove_old_staged(self):
+        sarge.run('git update-ref {}/dev/1000 HEAD'.format(
+                  cmdline.STAGED_REFS), cwd=self.repo_dir)
+        sarge.run('git update-ref {}/dev/{} HEAD'.format(
+                  cmdline.STAGED_REFS, int(time.time())), cwd=self.repo_dir)
+
+        remove_old_staged(7)
+        self.assertEqual(len(staged_refs('dev')), 1)
+
+
+class TestManifest(TestCaseWithTmp):
+
+    def test_build_manifest(self):
+        os.makedirs('.git')
+        os.makedirs('sub')
+        with open('index.html', 'w') as f:
+            f.write('foo')
+        sarge.run('touch sub/page.html', cwd=self.tempd)
+        os.chmod('sub/page.html', 0o755)
+        os.symlink('index.html', 'link.html')
+        os.symlink('sub', 'sub_link')
+
+        files = build_manifest(self.tempd)
+
+        self.assertEqual(sorted(files), ['index.html', 'link.html',
+                                         'sub/page.html', 'sub_link'])
+        self.assertEqual(files['index.html']['size'], 3)
+        self.assertEqual(files['index.html']['sha256'],
+                         '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98'
+                         'a5e886266e7ae')
+        self.assertEqual(files['index.html']['mode'], '100644')
+        self.assertEqual(files['sub/page.html']['mode'], '100755')
+        self.assertEqual(files['link.html']['mode'], '120000')
+        self.assertEqual(files['sub_link']['mode'], '120000')
+
+    def test_diff_manifests(self):
+        old = {'a': {'size': 1, 'sha256': 'x', 'mode': '100644'},
+               'b': {'size': 1, 'sha256': 'x', 'mode': '100644'},
+               'c': {'size': 1, 'sha256': 'x', 'mode': '100644'}}
+        new = {'a': {'size': 1, 'sha256': 'x', 'mode': '100644'},
+               'b': {'size': 2, 'sha256': 'y', 'mode': '100644'},
+               'd': {'size': 1, 'sha256': 'x', 'mode': '100644'}}
+        self.assertEqual(diff_manifests(old, new), (['d'], ['b'], ['c']))
+
+    @mock.patch('doc2git.cmdline.sarge_run')
+    def test_manifest_pushed(self, m):
+        m.side_effect = lambda *args, **kw: sarge.run(*args,
+                                                      **dict(kw,
+                                                             stdout=DEVNULL,
+                                                             stderr=DEVNULL))
+        repo_dir = os.path.join(self.tempd, 'normal_repo')
+        bare_dir = os.path.join(self.tempd, 'bare_repo')
+        os.makedirs(repo_dir)
+
+        sarge.run('touch readme', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git init', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git add .', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git commit -m "Test"', cwd=repo_dir, stdout=DEVNULL)
+        sarge.run('git clone --bare {} bare_repo'.format(repo_dir),
+                  cwd=self.tempd, stdout=DEVNULL, stderr=DEVNULL)
+
+        with tempfile.TemporaryDirectory(prefix='test') as tmp:
+            output_dir = os.path.join(tmp, 'copy', 'output')
+            os.makedirs(output_dir)
+            sarge.run('touch output.txt', cwd=output_dir, stdout=DEVNULL)
+
+            push_doc(bare_dir, 'dev', 'Commit msg', 'output', [], '', tmp)
+
+        files = read_manifest('dev', cwd=bare_dir)
+        self.assertEqual(sorted(files), ['output.txt'])
+        self.assertEqual(files['output.txt']['size'], 0)
+
+
+class TestLinkCheck(TestCaseWithTmp):
+
+    def write(self, path, content=''):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_check_links(self):
+        self.write('index.html', '<a href="sub/">Sub</a>\n'
+                                 '<a href="sub/page.html#ok">Ok</a>\n'
+                                 '<a href="sub/page.html#ko">Ko</a>\n'
+                                 '<a href="missing.html">Missing</a>\n'
+                                 '<a href="#top" id="top">Top</a>\n'
+                                 '<a href="http://example.com">Ext</a>\n'
+                                 '<img src="img/logo.png">\n')
+        self.write('sub/index.html', '<link href="../style.css">')
+        self.write('sub/page.html', '<h1 id="ok">Ok</h1>')
+        self.write('img/logo.png')
+
+        files = build_manifest(self.tempd)
+        problems, links = linkcheck.check_links(self.tempd, files,
+                                                workers=2)
+
+        self.assertEqual(problems, [
+            ('index.html', 3, 'sub/page.html#ko', linkcheck.ANCHOR_NOT_FOUND),
+            ('index.html', 4, 'missing.html', linkcheck.FILE_NOT_FOUND),
+            ('sub/index.html', 1, '../style.css', linkcheck.FILE_NOT_FOUND),
+        ])
+        self.assertEqual(links['index.html'], ['img/logo.png', 'index.html',
+                                               'missing.html',
+                                               'sub/index.html',
+                                               'sub/page.html'])
+
+    def test_check_only_given_pages(self):
+        self.write('index.html', '<a href="missing.html">Missing</a>')
+        self.write('other.html', '<a href="index.html">Index</a>')
+
+        files = build_manifest(self.tempd)
+        problems, links = linkcheck.check_links(self.tempd, files,
+                                                ['other.html'])
+        self.assertEqual(problems, [])
+        self.assertEqual(links, {'other.html': ['index.html']})
+
+    def test_check_output_fail(self):
+        self.write('index.html', '<a href="missing.html">Missing</a>')
+        files = build_manifest(self.tempd)
+
+        cmdline.check_output(self.tempd, {}, files, 'warn')
+        self.assertRaises(SystemExit, cmdline.check_output, self.tempd, {},
+                          files, 'fail')
+
+    def test_check_output_removed_anchor(self):
+        self.write('a.html', '<a href="b.html#sec">Section</a>')
+        self.write('b.html', '<h1 id="sec">Section</h1>')
+        self.write('c.html', '<a href="a.html">A</a>')
+
+        old_manifest = build_manifest(self.tempd)
+        cmdline.check_output(self.tempd, {}, old_manifest, 'fail')
+        self.assertEqual(old_manifest['a.html']['links'], ['b.html'])
+
+        # Only b.html changes, a.html links to it and has to be checked
+        self.write('b.html', '<h1>Section</h1>')
+        manifest = build_manifest(self.tempd)
+
+        with mock.patch('doc2git.cmdline.check_links',
+                        wraps=cmdline.check_links) as check:
+            self.assertRaises(SystemExit, cmdline.check_output, self.tempd,
+                              old_manifest, manifest, 'fail')
+        self.assertEqual(sorted(check.call_args[0][2]), ['a.html', 'b.html'])
+
+    def test_check_output_without_links(self):
+        self.write('a.html', '<a href="b.html#sec">Section</a>')
+        self.write('b.html', '<h1>Section</h1>')
+
+        # Previous manifest without links, all pages are checked
+        old_manifest = build_manifest(self.tempd)
+        self.write('b.html', '<h1>Other section</h1>')
+        manifest = build_manifest(self.tempd)
+
+        self.assertRaises(SystemExit, cmdline.check_output, self.tempd,
+                          old_manifest, manifest, 'fail')
+
+    def test_check_output_warn_then_fail(self):
+        self.write('a.html', '<a href="missing.html">Missing</a>')
+        self.write('b.html', '<a href="a.html">A</a>')
+
+        old_manifest = build_manifest(self.tempd)
+        cmdline.check_output(self.tempd, {}, old_manifest, 'warn')
+        self.assertTrue(old_manifest['a.html']['broken'])
+
+        # Nothing changed, a.html is checked again as it had broken links
+        manifest = build_manifest(self.tempd)
+        self.assertRaises(SystemExit, cmdline.check_output, self.tempd,
+                          old_manifest, manifest, 'fail')
+
+    def test_check_output_missing_file_added(self):
+        self.write('a.html', '<a href="sub/">Sub</a>')
+
+        old_manifest = build_manifest(self.tempd)
+        cmdline.check_output(self.tempd, {}, old_manifest, 'warn')
+        self.assertTrue(old_manifest['a.html']['broken'])
+
+        self.write('sub/index.html')
+        manifest = build_manifest(self.tempd)
+        cmdline.check_output(self.tempd, old_manifest, manifest, 'fail')
+        self.assertFalse('broken' in manifest['a.html'])
+        self.assertEqual(manifest['a.html']['links'], ['sub/index.html'])
+
+    def test_check_links_folder_symlink(self):
+        self.write('index.html', '<a href="sub_link/page.html#x">X</a>\n'
+                                 '<a href="sub_link/">Sub</a>\n'
+                                 '<a href="sub_link/missing.html">Y</a>\n'
+                                 '<a href="out_link/page.html">Out</a>\n')
+        self.write('sub/page.html', '<h1 id="x">X</h1>')
+        self.write('sub/index.html')
+        os.symlink('sub', 'sub_link')
+        os.symlink(tempfile.gettempdir(), 'out_link')
+
+        files = build_manifest(self.tempd)
+        problems, links = linkcheck.check_links(self.tempd, files)
+
+        self.assertEqual(problems, [('index.html', 3, 'sub_link/missing.html',
+                                     linkcheck.FILE_NOT_FOUND)])
+        self.assertEqual(links['index.html'], ['sub/index.html',
+                                               'sub/missing.html',
+                                               'sub/page.html'])